@@ -1,6 +1,9 @@
 """Conversions between KNX data types and native Python types"""
 
 from datetime import time, date, datetime, timedelta
+# Private aliases, timeupdater star-imports this module
+from math import frexp as _frexp
+import struct as _struct
 from knxip.core import KNXException
 
 
@@ -12,11 +15,17 @@ def float_to_knx2(floatval):
 
     floatval = floatval * 100
 
-    i = 0
-    for i in range(0, 15):
-        exp = pow(2, i)
-        if ((floatval / exp) >= -2048) and ((floatval / exp) < 2047):
-            break
+    # Smallest exponent for which the mantissa fits into 12 bits
+    if floatval < 0:
+        i = _frexp(-floatval)[1] - 11
+        if i > 0 and -floatval <= (2048 << (i - 1)):
+            i -= 1
+    else:
+        i = _frexp(floatval)[1] - 11
+        if floatval >= (2047 << max(i, 0)):
+            i += 1
+    i = min(max(i, 0), 14)
+    exp = 1 << i
 
     if floatval < 0:
         sign = 1
@@ -34,14 +43,14 @@ def knx2_to_float(knxdata):
     if len(knxdata) != 2:
         raise KNXException("Can only convert a 2 Byte object to float")
 
-    data = knxdata[0] * 256 + knxdata[1]
+    data = int.from_bytes(bytes(knxdata), 'big')
     sign = data >> 15
     exponent = (data >> 11) & 0x0f
     mantisse = float(data & 0x7ff)
     if sign == 1:
         mantisse = -2048 + mantisse
 
-    return mantisse * pow(2, exponent) / 100
+    return mantisse * (1 << exponent) / 100
 
 
 def time_to_knx(timeval, dow=0):
@@ -95,6 +104,26 @@ def knx_to_date(knxdata):
     return date(year, knxdata[1], knxdata[0])
 
 
+_DST_CACHE = {}
+
+
+def _dst_bounds(year):
+    """Return the (cached) start and end of daylight saving time for a year"""
+
+    bounds = _DST_CACHE.get(year)
+    if bounds is None:
+        # DST starts last Sunday in March
+        date1 = datetime(year, 4, 1)
+        dston = date1 - timedelta(days=date1.weekday() + 1)
+        # ends last Sunday in October
+        date2 = datetime(year, 11, 1)
+        dstoff = date2 - timedelta(days=date2.weekday() + 1)
+        bounds = (dston, dstoff)
+        _DST_CACHE[year] = bounds
+
+    return bounds
+
+
 def datetime_to_knx(datetimeval, clock_synced_external=1):
     """Convert a Python timestamp to an 8 byte KNX time and date object"""
 
@@ -105,20 +134,16 @@ def datetime_to_knx(datetimeval, clock_synced_external=1):
     res[0] = year - 1900
     res[1] = datetimeval.month
     res[2] = datetimeval.day
-    res[3] = (datetimeval.isoweekday() << 5) + datetimeval.hour
+    weekday = datetimeval.isoweekday()
+    res[3] = (weekday << 5) + datetimeval.hour
     res[4] = datetimeval.minute
     res[5] = datetimeval.second
-    if datetimeval.isoweekday() < 6:
+    if weekday < 6:
         is_working_day = 1
     else:
         is_working_day = 0
 
-    # DST starts last Sunday in March
-    date1 = datetime(year, 4, 1)
-    dston = date1 - timedelta(days=date1.weekday() + 1)
-    # ends last Sunday in October
-    date2 = datetime(year, 11, 1)
-    dstoff = date2 - timedelta(days=date2.weekday() + 1)
+    dston, dstoff = _dst_bounds(year)
     if dston <= datetimeval.replace(tzinfo=None) < dstoff:
         dst = 1
     else:
@@ -139,12 +164,7 @@ def knx_to_datetime(knxdata):
     if len(knxdata) != 8:
         raise KNXException("Can only convert an 8 Byte object to datetime")
 
-    year = knxdata[0] + 1900
-    month = knxdata[1]
-    day = knxdata[2]
-    hour = knxdata[3] & 0x1f
-    minute = knxdata[4]
-    second = knxdata[5]
-
-    return datetime(year, month, day, hour, minute, second)
+    year, month, day, hour, minute, second, dummy_flags, dummy_quality = \
+        _struct.unpack_from('>8B', bytes(knxdata))
 
+    return datetime(year + 1900, month, day, hour & 0x1f, minute, second)
@@ -2,9 +2,18 @@
 
 This implements some core KNX classes and methods.
 """
-import re
+import struct
+from functools import lru_cache
+
 from knxip.helper import tohex
 
+__all__ = ['E_NO_ERROR', 'E_HOST_PROTOCOL_TYPE', 'E_VERSION_NOT_SUPPORTED',
+           'E_SEQUENCE_NUMBER', 'E_CONNECTION_ID', 'E_CONNECTION_TYPE',
+           'E_CONNECTION_OPTION', 'E_NO_MORE_CONNECTIONS',
+           'E_DATA_CONNECTION', 'E_KNX_CONNECTION', 'E_TUNNELING_LAYER',
+           'parse_group_address', 'ValueCache', 'KNXException',
+           'KNXMessage']
+
 E_NO_ERROR = 0x00
 E_HOST_PROTOCOL_TYPE = 0x01
 E_VERSION_NOT_SUPPORTED = 0x02
@@ -17,7 +26,27 @@ E_DATA_CONNECTION = 0x26
 E_KNX_CONNECTION = 0x27
 E_TUNNELING_LAYER = 0x28
 
+_ERROR_MESSAGES = {
+    E_NO_ERROR: "no error",
+    E_HOST_PROTOCOL_TYPE: "protocol type error",
+    E_VERSION_NOT_SUPPORTED: "version not supported",
+    E_SEQUENCE_NUMBER: "invalid sequence number",
+    E_CONNECTION_ID: "invalid connection id",
+    E_CONNECTION_TYPE: "invalid connection type",
+    E_CONNECTION_OPTION: "invalid connection option",
+    E_NO_MORE_CONNECTIONS: "no more connection possible",
+    E_DATA_CONNECTION: "data connection error",
+    E_KNX_CONNECTION: "KNX connection error",
+    E_TUNNELING_LAYER: "tunneling layer error",
+}
+
+
+# Digits of an address part, str.isdecimal() would also accept non-ASCII
+# digits
+_DIGITS = '0123456789'
+
 
+@lru_cache(maxsize=1024)
 def parse_group_address(addr):
     """Parse KNX group addresses and return the address as an integer.
 
@@ -28,34 +57,29 @@ def parse_group_address(addr):
     if addr is None:
         raise KNXException("No address given")
 
-    res = None
+    # Numeric addresses need no splitting
+    if addr and not addr.strip(_DIGITS):
+        return int(addr)
 
-    if re.match('[0-9]+$', addr):
-        res = int(addr)
+    parts = addr.split('/')
+    if all(part and not part.strip(_DIGITS) for part in parts):
+        if len(parts) == 3:
+            main, middle, sub = parts
+            return (int(main) << 11) + (int(middle) << 8) + int(sub)
 
-    match = re.match("([0-9]+)/([0-9]+)$", addr)
-    if match:
-        main = match.group(1)
-        sub = match.group(2)
-        res = int(main) * 2048 + int(sub)
+        if len(parts) == 2:
+            main, sub = parts
+            return (int(main) << 11) + int(sub)
 
-    match = re.match("([0-9]+)/([0-9]+)/([0-9]+)$", addr)
-    if match:
-        main = match.group(1)
-        middle = match.group(2)
-        sub = match.group(3)
-        res = int(main) * 256 * 8 + int(middle) * 256 + int(sub)
-
-    if res is None:
-        raise KNXException("Address {} does not match any address scheme".
-                           format(addr))
-
-    return res
+    raise KNXException("Address {} does not match any address scheme".
+                       format(addr))
 
 
 class ValueCache(object):
     """A simple caching class based on dictionaries"""
 
+    __slots__ = ('values',)
+
     def __init__(self):
         """Initialize an empty cache"""
         self.values = {}
@@ -66,12 +90,11 @@ class ValueCache(object):
 
     def set(self, name, value):
         """Set the cached value for the given name"""
-        old_val = self.values.get(name)
-        if old_val != value:
+        if self.values.get(name) != value:
             self.values[name] = value
             return True
-        else:
-            return False
+
+        return False
 
     def clear(self):
         """Remove all cached entries."""
@@ -90,76 +113,67 @@ class KNXException(Exception):
 
     def __str__(self):
         """Return a human-readable representation of the exception"""
-        msg = {
-            E_NO_ERROR: "no error",
-            E_HOST_PROTOCOL_TYPE: "protocol type error",
-            E_VERSION_NOT_SUPPORTED: "version not supported",
-            E_SEQUENCE_NUMBER: "invalid sequence number",
-            E_CONNECTION_ID: "invalid connection id",
-            E_CONNECTION_TYPE: "invalid connection type",
-            E_CONNECTION_OPTION: "invalid connection option",
-            E_NO_MORE_CONNECTIONS: "no more connection possible",
-            E_DATA_CONNECTION: "data connection error",
-            E_KNX_CONNECTION: "KNX connection error",
-            E_TUNNELING_LAYER: "tunneling layer error",
-        }
-
-        return super().__str__() + " " + msg.get(self.errorcode,
-                                                 "unknown error code")
+        return super().__str__() + " " + _ERROR_MESSAGES.get(
+            self.errorcode, "unknown error code")
+
+
+# Frame layout (control field, source, destination, length field and
+# payload) for every possible length value, the checksum is appended later
+_FRAME_STRUCTS = tuple(struct.Struct('>BHHB{}B'.format(max(length - 1, 0)))
+                       for length in range(16))
+
 
 #pylint: disable=too-many-instance-attributes
 #pylint: disable=invalid-name
 class KNXMessage(object):
     """This represents a message on the KNX bus."""
 
-    repeat = 0
-    priority = 3   # (0 = system, 1 - alarm, 2 - high, 3 - normal)
-    src_addr = 0
-    dst_addr = 0
-    dt = 0
-    routing = 1
-    length = 1
-    data = [0]
-    multicast = 1
+    __slots__ = ('repeat', 'priority', 'src_addr', 'dst_addr', 'dt',
+                 'routing', 'length', 'data', 'multicast')
 
     def __init__(self):
         """Initialize an empty KNX message"""
-        pass
+        self.repeat = 0
+        self.priority = 3   # (0 = system, 1 - alarm, 2 - high, 3 - normal)
+        self.src_addr = 0
+        self.dst_addr = 0
+        self.dt = 0
+        self.routing = 1
+        self.length = 1
+        self.data = [0]
+        self.multicast = 1
 
     def sanitize(self):
         """Sanitize all fields of the KNX message."""
-        self.repeat = self.repeat % 2
-        self.priority = self.priority % 4
-        self.src_addr = self.src_addr % 0x10000
-        self.dst_addr = self.dst_addr % 0x10000
-        self.multicast = self.multicast % 2
-        self.routing = self.routing % 8
-        self.length = self.length % 16
+        self.repeat &= 0x01
+        self.priority &= 0x03
+        self.src_addr &= 0xffff
+        self.dst_addr &= 0xffff
+        self.multicast &= 0x01
+        self.routing &= 0x07
+        self.length &= 0x0f
+        data = self.data
         for i in range(0, self.length - 1):
-            self.data[i] = self.data[i] % 0x100
+            data[i] &= 0xff
 
     def to_frame(self):
         """Convert the object to its frame format."""
         self.sanitize()
-        res = []
-        res.append((1 << 7) + (1 << 4) + (self.repeat << 5) +
-                   (self.priority << 2))
-        res.append(self.src_addr >> 8)
-        res.append(self.src_addr % 0x100)
-        res.append(self.dst_addr >> 8)
-        res.append(self.dst_addr % 0x100)
-        res.append((self.multicast << 7) + (self.routing << 4) + self.length)
-
-        for i in range(0, self.length - 1):
-            res.append(self.data[i])
-
-        checksum = 0
-        for i in range(0, 5 + self.length):
-            checksum += res[i]
-
-        res.append(checksum % 0x100)
-
-        return bytearray(res)
+        # Header, length - 1 data bytes and the checksum, a length of 0
+        # carries no data
+        data_length = max(self.length - 1, 0)
+        res = bytearray(7 + data_length)
+        _FRAME_STRUCTS[self.length].pack_into(
+            res, 0,
+            (1 << 7) + (1 << 4) + (self.repeat << 5) + (self.priority << 2),
+            self.src_addr,
+            self.dst_addr,
+            (self.multicast << 7) + (self.routing << 4) + self.length,
+            *self.data[:data_length])
+
+        res[-1] = sum(res) & 0xff
+
+        return res
 
     @classmethod
     def from_frame(cls, frame):
@@ -167,15 +181,12 @@ class KNXMessage(object):
         message = cls()
 
         # Check checksum first
-        checksum = 0
-        for i in range(0, len(frame) - 1):
-            checksum += frame[i]
+        checksum = sum(frame[:-1]) & 0xff
 
-        if (checksum % 0x100) != frame[len(frame) - 1]:
+        if checksum != frame[-1]:
             raise KNXException('Checksum error in frame {}, '
                                'expected {} but got {}'
-                               .format(tohex(frame), frame[len(frame) - 1],
-                                       checksum % 0x100))
+                               .format(tohex(frame), frame[-1], checksum))
 
         message.repeat = (frame[0] >> 5) & 0x01
         message.priority = (frame[0] >> 2) & 0x03
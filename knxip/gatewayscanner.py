@@ -14,15 +14,19 @@ TODO:
 David Baumann(daBONDi@users.noreply.github.com)
 """
 
-import asyncio
 import logging
+import selectors
+import socket
 import struct
-
-from knxip.helper import ip_to_array
-from knxip.helper import int_to_array
+import time
 
 LOGGER = logging.getLogger(__name__)
 
+# Host protocol address information: length, protocol, IPv4 address, port
+_HPAI_STRUCT = struct.Struct('!BB4sH')
+# KNX/IP header followed by the discovery endpoint HPAI
+_SEARCH_REQUEST_STRUCT = struct.Struct('!BBHHBB4sH')
+
 
 class GatewayScanner:
     """
@@ -34,16 +38,6 @@ class GatewayScanner:
     # Default Multicast Address from KNX Assoc "224.0.23.12"
     _default_broadcast_address = "224.0.23.12"
 
-    # Holder for the Transport Protocol Instance of the Broadcast listener
-    _listener_transport = None
-    # Holder for the Transport Protocol Instance of the Broadcast sender
-    _broadcaster_transport = None
-
-    _resolved_gateway_ip_address = None  # Gateway IP Address if found
-    _resolved_gateway_ip_port = None  # Gateway Port if found
-
-    _asyncio_loop = None
-
     def __init__(self, broadcast_source_ip_address="0.0.0.0",
                  broadcast_port=_default_knx_port,
                  broadcast_address=_default_broadcast_address,
@@ -60,11 +54,11 @@ class GatewayScanner:
         :param timeout: Time in seconds to wait for an Response before
             returning None on the start_search method
         """
-        self.__timeout = timeout
         self._broadcast_ip_address = broadcast_source_ip_address
         self._broadcast_address = broadcast_address
         self._broadcast_port = broadcast_port
         self._timeout = timeout
+        self._resolved_gateway = None  # Gateway (IP Address, Port) if found
 
     def start_search(self):
         """
@@ -75,181 +69,128 @@ class GatewayScanner:
             timeout occurs
         """
 
-        self._asyncio_loop = asyncio.get_event_loop()
-
-        # Creating Broadcast Receiver
-        coroutine_listen = self._asyncio_loop.create_datagram_endpoint(
-            lambda: self.KNXSearchBroadcastReceiverProtocol(
-                self._process_response,
-                self._timeout_handling,
-                self._timeout,
-                self._asyncio_loop
-            ), local_addr=(self._broadcast_ip_address, 0)
-        )
-        self._listener_transport, listener_protocol = \
-            self._asyncio_loop.run_until_complete(coroutine_listen)
-
-        # We are ready to fire the broadcast message
-        coroutine_broadcaster = self._asyncio_loop.create_datagram_endpoint(
-            lambda: self.KNXSearchBroadcastProtocol(
-                self._asyncio_loop,
-                self._listener_transport.get_extra_info('sockname')
-                [1]),
-            remote_addr=(self._broadcast_address, self._broadcast_port))
-
-        self._broadcaster_transport, broadcast_protocol = \
-            self._asyncio_loop.run_until_complete(coroutine_broadcaster)
-        # Waiting for all Broadcast receive or timeout
-        self._asyncio_loop.run_forever()
+        self._resolved_gateway = None
+        self._search()
 
         # Got Response or Timeout
-        if self._resolved_gateway_ip_address is None and \
-           self._resolved_gateway_ip_port is None:
+        if self._resolved_gateway is None:
             LOGGER.debug("Gateway not found!")
-            return None
         else:
-            LOGGER.debug("Gateway found at %s:%s",
-                         self._resolved_gateway_ip_address,
-                         self._resolved_gateway_ip_port)
+            LOGGER.debug("Gateway found at %s:%s", *self._resolved_gateway)
 
-            return self._resolved_gateway_ip_address, \
-                self._resolved_gateway_ip_port
+        return self._resolved_gateway
 
-    def _timeout_handling(self):
+    def _search(self):
         """
-        Timeout handler of the Broadcast Listener Socket
+        Send the search request and wait for a response or the timeout
         """
 
-        LOGGER.error("Listener didn't receive any packets, timeout (%i s)",
-                     self._timeout)
-
-    def _process_response(self, received_data):
-        """
-        Processing the incoming UDP Datagram from the Broadcast Socket
+        # Creating Broadcast Receiver, a bare socket watched by the selector
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setblocking(False)
+            sock.bind((self._broadcast_ip_address, 0))
+            LOGGER.debug("Broadcast Receiver Started")
 
-        :param received_data: UDP Datagram Package to Process
-        :type received_data: Byte
+            # We are ready to fire the broadcast message
+            self._send_search_request(sock.getsockname()[1])
+
+            # Waiting for the Broadcast response or timeout
+            with selectors.DefaultSelector() as selector:
+                selector.register(sock, selectors.EVENT_READ)
+                deadline = time.monotonic() + self._timeout
+                while self._resolved_gateway is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        LOGGER.error(
+                            "Listener don't receive any packets, timeout!")
+                        break
+                    if selector.select(remaining):
+                        self._receive_response(sock)
+        finally:
+            LOGGER.debug("Closing broadcast receiver socket")
+            sock.close()
+
+    def _receive_response(self, sock):
         """
-        resp = bytearray(received_data)
-        self._resolved_gateway_ip_address = str.format(
-            "{}.{}.{}.{}", resp[8], resp[9], resp[10], resp[11])
-        self._resolved_gateway_ip_port = struct.unpack(
-            '!h', bytes(resp[12:14]))[0]
+        Read the response of a gateway from the Broadcast Receiver socket
 
-    class KNXSearchBroadcastReceiverProtocol(asyncio.DatagramProtocol):
+        :param sock: Socket of the Broadcast Receiver
         """
-        Implements a protocol to receive broadcasts.
+        try:
+            data, addr = sock.recvfrom(1024)
+        except OSError as exc:
+            LOGGER.error("Error on the broadcast receiver socket: %s", exc)
+            return
+
+        LOGGER.debug("Search Request Response received from %s:%s",
+                     addr[0],
+                     addr[1])
+        self._process_response(data)
+
+    def _send_search_request(self, listener_port):
         """
+        Send the Search Request to the broadcast address
 
-        def __init__(self,
-                     broadcast_data_received_callback,
-                     timeout_callback,
-                     timeout_value,
-                     loop):
-            """
-            Create a new KNX Search Broadcast Receiver Protocol Object
-
-            :param broadcast_data_received_callback: function callback
-                if data received
-            :param timeout_callback: function callback if timeout occur
-            :param timeout_value: Timeout in seconds when to stop waiting
-            :param loop: Asyncio Loop to use
-            """
-            self.processing_data = broadcast_data_received_callback
-            self.timeout_handler = timeout_callback
-            self.timeout_in_seconds = timeout_value
-            self.loop = loop
-            self.transport = None
-
-            self.h_timeout = asyncio.get_event_loop().call_later(
-                self.timeout_in_seconds, self.timeout
-            )
-
-        def timeout(self):
-            """ A timeout has occured. """
-            LOGGER.error("Listener don't receive any packets, timeout!")
-            self.transport.close()
-
-        def connection_made(self, transport):
-            """ A connection has been established. """
-            LOGGER.debug("Broadcast Receiver Started")
-            self.transport = transport
-
-        def datagram_received(self, data, addr):
-            """ A datagram has been received. """
-            LOGGER.debug("Search Request Response received from %s:%s",
-                         addr[0],
-                         addr[1])
-            self.h_timeout.cancel()
-            self.processing_data(data)
-            self.transport.close()
-
-        def error_received(self, exc):
-            """ An error has been received. """
-            if exc:
-                LOGGER.error("Error on the broadcast receiver socket: %s", exc)
-
-        def connection_lost(self, exc):
-            """ An established connection has been lost. """
-            if exc:
-                LOGGER.error("Error on the broadcast receiver socket: %s", exc)
-            else:
-                LOGGER.debug("Closing broadcast receiver socket")
-
-            self.loop.stop()
-            super().connection_lost(exc)
-
-    class KNXSearchBroadcastProtocol:
-        """ Class that handles the KNX broadcast protocol. """
-
-        def __init__(self, async_loop, listener_port):
-            """
-             Create a new KNX Search Broadcast Protocol Object
-
-            :param async_loop: Asyncio Base Event Loop to use
-            :type async_loop: BaseEventLoop
-            """
-
-            self.loop = async_loop
-            self.transport = None
-            self._listener_port = listener_port
-
-        @staticmethod
-        def _build_search_request_data(requestor_ipaddress, requestor_port):
-            """
-            Build a KNX IP Search Request Broadcast Package
-
-            :param requestor_ipaddress: IP Address of the Search Request
-                Response Receiver
-            :param requestor_port: Port of the Search Request Response Receiver
-            :return: Complete Search Request Broadcast Package
-            :rtype: bytes
-            """
-            req = []
-            req.extend([0x06])  # HeaderSize
-            req.extend([0x10])  # KNXNetIP Version
-            req.extend([0x02, 0x01])  # Search Reques°t
-            req.extend([0x00, 0x0E])  # HEADER_SIZE_10 + sizeof(HPAI)
-            # ==== Discovery Endpoint HPAI ====
-            req.extend([0x08])  # Struct Length
-            req.extend([0x01])  # Host Protocol Code = 0x01 = IPV4_UDP
-            req.extend(ip_to_array(requestor_ipaddress))
-            req.extend(int_to_array(requestor_port))
-            return bytes(req)
-
-        def connection_made(self, transport):
-            """ Connection has been established. """
-            self.transport = transport
+        :param listener_port: Port of the Search Request Response Receiver
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            if self._broadcast_ip_address != "0.0.0.0":
+                # Multicast out of the interface we are listening on
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                                socket.inet_aton(self._broadcast_ip_address))
+            # Connecting a datagram socket sends nothing, but selects the
+            # local address the gateway has to respond to
+            sock.connect((self._broadcast_address, self._broadcast_port))
             LOGGER.debug("Broadcast Search Request Started")
-            self.transport.sendto(
-                self._build_search_request_data(
-                    self.transport.get_extra_info(
-                        'sockname')[0], self._listener_port
-                )
-            )
+            sock.send(self._build_search_request_data(
+                sock.getsockname()[0], listener_port))
             LOGGER.debug(
                 "Search Request broadcast send, waiting for response ")
-
-        def error_received(self, exc):
-            """ An error has been received. """
+        except OSError as exc:
             LOGGER.error("Error on Broadcast socket: %s", exc)
+        finally:
+            sock.close()
+
+    @staticmethod
+    def _build_search_request_data(requestor_ipaddress, requestor_port):
+        """
+        Build a KNX IP Search Request Broadcast Package
+
+        :param requestor_ipaddress: IP Address of the Search Request
+            Response Receiver
+        :param requestor_port: Port of the Search Request Response Receiver
+        :return: Complete Search Request Broadcast Package
+        :rtype: bytes
+        """
+        return _SEARCH_REQUEST_STRUCT.pack(
+            0x06,  # HeaderSize
+            0x10,  # KNXNetIP Version
+            0x0201,  # Search Request
+            0x000E,  # HEADER_SIZE_10 + sizeof(HPAI)
+            # ==== Discovery Endpoint HPAI ====
+            0x08,  # Struct Length
+            0x01,  # Host Protocol Code = 0x01 = IPV4_UDP
+            socket.inet_aton(requestor_ipaddress),
+            requestor_port)
+
+    def _process_response(self, received_data):
+        """
+        Processing the incoming UDP Datagram from the Broadcast Socket
+
+        :param received_data: UDP Datagram Package to Process
+        :type received_data: Byte
+        :return: False if the datagram is too short to be a response
+        """
+        if len(received_data) < 6 + _HPAI_STRUCT.size:
+            LOGGER.warning("Ignoring truncated Search Request Response "
+                           "(%d bytes)", len(received_data))
+            return False
+
+        # Control endpoint HPAI: length, protocol, IPv4 address, port
+        dummy_size, dummy_proto, ipaddr, port = _HPAI_STRUCT.unpack_from(
+            received_data, 6)
+        self._resolved_gateway = socket.inet_ntoa(ipaddr), port
+        return True
@@ -1,15 +1,17 @@
 """Helper functions that are not specifically KNX related"""
 
+__all__ = ['tohex', 'ip_to_array', 'int_to_array']
+
+
 def tohex(byte_array):
     """Convert a byte array to a HEX string representation."""
-    return "".join("%02x " % b for b in byte_array)
+    # One format operation for the whole array instead of one per byte
+    return ("%02x " * len(byte_array)) % tuple(byte_array)
 
 
 def ip_to_array(ipaddress):
     """Convert a string representing an IPv4 address to 4 bytes."""
-    res = []
-    for i in ipaddress.split("."):
-        res.append(int(i))
+    res = [int(i) for i in ipaddress.split(".")]
 
     assert len(res) == 4
     return res
@@ -17,8 +19,7 @@ def ip_to_array(ipaddress):
 
 def int_to_array(i, length=2):
     """Convert an length byte integer to an array of bytes."""
-    res = []
-    for dummy in range(0, length):
-        res.append(i & 0xff)
-        i = i >> 8
+    # Mask first, like the former byte-by-byte loop did
+    res = (i & ((1 << (8 * length)) - 1)).to_bytes(length, 'little')
+    # Most significant byte first, as a reversed iterator like before
     return reversed(res)
@@ -1,16 +1,38 @@
 """Module to connect to a KNX bus using a KNX/IP tunnelling interface.
 """
 import socket
+import struct
 import threading
 import logging
 import time
-import queue as queue
 import socketserver as SocketServer
+from collections import defaultdict
 
 from knxip.core import KNXException, ValueCache, E_NO_ERROR
-from knxip.helper import int_to_array, ip_to_array
 from knxip.gatewayscanner import GatewayScanner
 
+LOGGER = logging.getLogger(__name__)
+
+# KNX/IP header: header length, protocol version, service type, total length
+_HEADER_STRUCT = struct.Struct('!BBHH')
+# KNX/IP header followed by the channel id and status of a response
+_RESPONSE_STRUCT = struct.Struct('!BBHHBB')
+# Host protocol address information: length, protocol, IPv4 address, port
+_HPAI_STRUCT = struct.Struct('!BB4sH')
+# KNX/IP header followed by the connection header of a tunnelling request
+_TUNNELING_HEADER_STRUCT = struct.Struct('!BBHHBBBB')
+# cEMI L_Data frame after the additional information: control fields,
+# source and destination address, NPDU length, TPCI/APCI
+_CEMI_STRUCT = struct.Struct('!BBHHBH')
+# Connection request information: tunnel connection on the link layer
+_CRI_TUNNEL = b'\x04\x04\x02\x00'
+# Receive buffer of the data socket, absorbs telegram bursts on a busy bus
+_DATA_RCVBUF = 1 << 20
+# Size of the reused control socket buffer, responses are at most 26 bytes
+_CONTROL_BUFSIZE = 64
+# Size of the reused transmit buffer, large enough for extended frames
+_TX_BUFSIZE = 512
+
 
 class KNXIPFrame():
     """Representation of a KNX/IP frame."""
@@ -38,30 +60,57 @@ class KNXIPFrame():
     REMCONF_CONNECTION = 0x07
     OBJSVR_CONNECTION = 0x08
 
+    # Host protocol codes
+    IPV4_UDP = 0x01
+    IPV4_TCP = 0x02
+
     # CONNECTIONSTATE_RESPONSE Status Codes
     # 3.8.2 - 7.8.4
     E_DATA_CONNECTION = 0x26
     E_CONNECTION_ID = 0x21
     E_KNX_CONNECTION = 0x27
 
+    CONNECTIONSTATE_ERRORS = {
+        E_CONNECTION_ID: "No active connection found",
+        E_DATA_CONNECTION: "Data Connection Error Response",
+        E_KNX_CONNECTION: "KNX Sub Network Error Response",
+    }
+
     # Generic Response Status Code
     E_NO_ERROR = 0x0
 
-    body = None
+    __slots__ = ('service_type_id', 'body')
 
     def __init__(self, service_type_id):
         """Initalize an empty frame with the given service type."""
         self.service_type_id = service_type_id
+        self.body = None
 
     def to_frame(self):
         """Return the frame as an array of bytes."""
-        return bytearray(self.header() + self.body)
+        frame = bytearray(self.total_length())
+        self.pack_into(frame)
+        return frame
+
+    def pack_into(self, buf, offset=0):
+        """Write the frame into buf at the given offset.
+
+        This allows callers to serialize the frame into an existing buffer
+        without intermediate copies. Returns the number of bytes written.
+        """
+        total_length = self.total_length()
+        _HEADER_STRUCT.pack_into(buf, offset, 0x06, 0x10,
+                                 self.service_type_id, total_length)
+        buf[offset + 6:offset + total_length] = self.body
+        return total_length
 
     @classmethod
     def from_frame(cls, frame):
         """Initilize the frame object based on a KNX/IP data frame."""
         # TODO: Check length
-        ipframe = cls(frame[2] * 256 + frame[3])
+        dummy_hlen, dummy_version, service_type_id, dummy_total_length = \
+            _HEADER_STRUCT.unpack_from(frame)
+        ipframe = cls(service_type_id)
         ipframe.body = frame[6:]
         return ipframe
 
@@ -70,20 +119,17 @@ class KNXIPFrame():
         return 6 + len(self.body)
 
     def header(self):
-        """Return the frame header (as an array of bytes)."""
-        total_length = self.total_length()
-        res = [0x06, 0x10, 0, 0, 0, 0]
-        res[2] = (self.service_type_id >> 8) & 0xff
-        res[3] = (self.service_type_id >> 0) & 0xff
-        res[4] = (total_length >> 8) & 0xff
-        res[5] = (total_length >> 0) & 0xff
-        return res
+        """Return the frame header (as bytes)."""
+        return _HEADER_STRUCT.pack(0x06, 0x10, self.service_type_id,
+                                   self.total_length())
 
 
 # pylint: disable=too-few-public-methods
 class KNXTunnelingRequest:
     """Representation of a KNX/IP tunnelling request."""
 
+    __slots__ = ('seq', 'cemi', 'channel')
+
     def __init__(self):
         """Initialize object."""
         self.seq = 0
@@ -110,20 +156,34 @@ class CEMIMessage():
     CMD_GROUP_RESPONSE = 3
     CMD_UNKNOWN = 0xff
 
-    code = 0
-    ctl1 = 0
-    ctl2 = 0
-    src_addr = None
-    dst_addr = None
-    cmd = None
-    tpci_apci = 0
-    mpdu_len = 0
-    data = [0]
-    dptsize = 0
+    # cEMI message codes handled by the tunnel: L_Data.ind, L_Data.con
+    MESSAGE_CODES = frozenset((0x29, 0x2e))
+
+    CMD_NAMES = {
+        CMD_GROUP_READ: "RD",
+        CMD_GROUP_WRITE: "WR",
+        CMD_GROUP_RESPONSE: "RS",
+    }
+
+    # Commands by APCI bits 7 and 6, a zero APCI is a group read
+    _APCI_COMMANDS = (CMD_UNKNOWN, CMD_GROUP_RESPONSE,
+                      CMD_GROUP_WRITE, CMD_GROUP_WRITE)
+
+    __slots__ = ('code', 'ctl1', 'ctl2', 'src_addr', 'dst_addr', 'cmd',
+                 'tpci_apci', 'mpdu_len', 'data', 'dptsize')
 
     def __init__(self):
-        """Initialize object."""
-        pass
+        """Initialize an empty message."""
+        self.code = 0
+        self.ctl1 = 0
+        self.ctl2 = 0
+        self.src_addr = None
+        self.dst_addr = None
+        self.cmd = None
+        self.tpci_apci = 0
+        self.mpdu_len = 0
+        self.data = [0]
+        self.dptsize = 0
 
     @classmethod
     def from_body(cls, cemi):
@@ -133,39 +193,29 @@ class CEMIMessage():
         message.code = cemi[0]
         offset = cemi[1]
 
-        message.ctl1 = cemi[2 + offset]
-        message.ctl2 = cemi[3 + offset]
-
-        message.src_addr = cemi[4 + offset] * 256 + cemi[5 + offset]
-        message.dst_addr = cemi[6 + offset] * 256 + cemi[7 + offset]
-
-        message.mpdu_len = cemi[8 + offset]
-
-        tpci_apci = cemi[9 + offset] * 256 + cemi[10 + offset]
+        message.ctl1, message.ctl2, message.src_addr, message.dst_addr, \
+            message.mpdu_len, tpci_apci = _CEMI_STRUCT.unpack_from(
+                cemi, 2 + offset)
         apci = tpci_apci & 0x3ff
 
         # for APCI codes see KNX Standard 03/03/07 Application layer
         # table Application Layer control field
-        if apci & 0x080:
-            # Group write
-            message.cmd = CEMIMessage.CMD_GROUP_WRITE
-        elif apci == 0:
+        if apci == 0:
             message.cmd = CEMIMessage.CMD_GROUP_READ
-        elif apci & 0x40:
-            message.cmd = CEMIMessage.CMD_GROUP_RESPONSE
         else:
-            message.cmd = CEMIMessage.CMD_UNKNOWN
+            message.cmd = CEMIMessage._APCI_COMMANDS[(apci >> 6) & 0x3]
 
-        apdu = cemi[10 + offset:]
-        if len(apdu) != message.mpdu_len:
+        apdu_len = len(cemi) - 10 - offset
+        if apdu_len != message.mpdu_len:
             raise KNXException(
                 "APDU LEN should be {} but is {}".format(
-                    message.mpdu_len, len(apdu)))
+                    message.mpdu_len, apdu_len))
 
-        if len(apdu) == 1:
+        if apdu_len == 1:
             message.data = [apci & 0x2f]
         else:
-            message.data = cemi[11 + offset:]
+            # Copy only the payload, cemi might be a view on the datagram
+            message.data = bytes(cemi[11 + offset:])
 
         return message
 
@@ -200,31 +250,30 @@ class CEMIMessage():
 
     def to_body(self):
         """Convert the CEMI frame object to its byte representation."""
-        body = [self.code, 0x00, self.ctl1, self.ctl2,
-                (self.src_addr >> 8) & 0xff, (self.src_addr >> 0) & 0xff,
-                (self.dst_addr >> 8) & 0xff, (self.dst_addr >> 0) & 0xff]
         if self.dptsize == 0 and (len(self.data) == 1) and ((self.data[0] & 0xC0) == 0):
             # less than 6 bit of data, pack into APCI byte
-            body.extend([1, (self.tpci_apci >> 8) & 0xff,
-                         ((self.tpci_apci >> 0) & 0xff) + self.data[0]])
+            body = bytearray(2 + _CEMI_STRUCT.size)
+            _CEMI_STRUCT.pack_into(body, 2, self.ctl1, self.ctl2,
+                                   self.src_addr & 0xffff,
+                                   self.dst_addr & 0xffff,
+                                   1, self.tpci_apci + self.data[0])
         else:
-            body.extend([1 + len(self.data), (self.tpci_apci >> 8) &
-                         0xff, (self.tpci_apci >> 0) & 0xff])
-            body.extend(self.data)
+            body = bytearray(2 + _CEMI_STRUCT.size + len(self.data))
+            _CEMI_STRUCT.pack_into(body, 2, self.ctl1, self.ctl2,
+                                   self.src_addr & 0xffff,
+                                   self.dst_addr & 0xffff,
+                                   1 + len(self.data), self.tpci_apci)
+            body[2 + _CEMI_STRUCT.size:] = self.data
+        # message code, no additional information
+        body[0] = self.code
 
         return body
 
     def __str__(self):
         """Return a human readable string for debugging."""
-        cmd = "??"
-        if self.cmd == self.CMD_GROUP_READ:
-            cmd = "RD"
-        elif self.cmd == self.CMD_GROUP_WRITE:
-            cmd = "WR"
-        elif self.cmd == self.CMD_GROUP_RESPONSE:
-            cmd = "RS"
         return "{0:x}->{1:x} {2} {3}".format(
-            self.src_addr, self.dst_addr, cmd, self.data)
+            self.src_addr, self.dst_addr,
+            self.CMD_NAMES.get(self.cmd, "??"), self.data)
 
 
 class KNXIPTunnel():
@@ -235,9 +284,7 @@ class KNXIPTunnel():
     channel = None
     seq = 0
     data_handler = None
-    result_queue = None
     notify = None
-    address_listeners = {}
 
     def __init__(self, ip="0.0.0.0", port=3671, valueCache=None):
         """Initialize the connection to the given host/port
@@ -248,8 +295,17 @@ class KNXIPTunnel():
         self.remote_port = port
         self.discovery_port = None
         self.data_port = None
+        self._control_hpai = None
+        # Channel and control HPAI, valid until the next disconnect
+        self._hpai_bytes = None
+        # (remote address, local IP) of the last route lookup
+        self._local_route = None
         self.connected = False
-        self.result_queue = queue.Queue()
+        self.address_listeners = defaultdict(set)
+        # Group address a group_read waits for and the response data
+        self._response_addr = None
+        self._response_data = None
+        self._response_event = threading.Event()
         self.ack_semaphore = threading.Semaphore(0)
         self.conn_state_ack_semaphore = threading.Semaphore(0)
         if valueCache is None:
@@ -257,23 +313,29 @@ class KNXIPTunnel():
         else:
             self.value_cache = valueCache
         self.connection_state = 0
-        self.keepalive_thread = threading.Thread(target=self.keepalive,
-                                                 args=())
-        self.keepalive_thread.daemon = True
-        self.keepalive_thread.start()
-        self._lock = threading.Lock()
+        # Heartbeat thread of the current connection and its stop event
+        self.keepalive_thread = None
+        self._keepalive_stop = None
+        # Reentrant, group operations hold it while sending their request
+        self._lock = threading.RLock()
         self._write_delay = 0.05
+        # Control responses are small, receive them into a reused buffer
+        self._control_buf = bytearray(_CONTROL_BUFSIZE)
+        # Outgoing tunnelling requests are built in place, guarded by _lock
+        self._tx_buf = bytearray(_TX_BUFSIZE)
 
     def __del__(self):
         """Make sure an open tunnel connection will be closed"""
         self.disconnect()
 
-    def keepalive(self):
-        """Background method that makes sure the connection is still open."""
-        while True:
+    def keepalive(self, stop):
+        """Background method that makes sure the connection is still open.
+
+        Runs until the given event is set by disconnect.
+        """
+        while not stop.wait(60):
             if self.connected:
                 self.check_connection_state()
-            time.sleep(60)
 
     def connect(self, timeout=2):
         """Connect to the KNX/IP tunnelling interface.
@@ -286,41 +348,45 @@ class KNXIPTunnel():
         """
 
         if self.connected:
-            logging.info("KNXIPTunnel connect request ignored, "
-                         "already connected")
+            LOGGER.info("KNXIPTunnel connect request ignored, "
+                        "already connected")
             return True
 
         if self.remote_ip == "0.0.0.0":
             scanner = GatewayScanner()
             try:
                 ipaddr, port = scanner.start_search()
-                logging.info("Found KNX gateway %s/%s", ipaddr, port)
+                LOGGER.info("Found KNX gateway %s/%s", ipaddr, port)
                 self.remote_ip = ipaddr
                 self.remote_port = port
             except TypeError:
-                logging.error("No KNX/IP gateway given and no gateway "
-                              "found by scanner, aborting %s")
+                LOGGER.error("No KNX/IP gateway given and no gateway "
+                             "found by scanner, aborting")
 
         # Clean up cache
         self.value_cache.clear()
 
         # Find my own IP
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.connect((self.remote_ip, self.remote_port))
-        local_ip = sock.getsockname()[0]
+        local_ip = self._local_ip()
 
         if self.data_server:
-            logging.info("Data server already running, not starting again")
+            LOGGER.info("Data server already running, not starting again")
         else:
             self.data_server = DataServer((local_ip, 0),
                                           DataRequestHandler,
                                           self)
             dummy_ip, self.data_port = self.data_server.server_address
+            data_socket = self.data_server.socket
+            data_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                   _DATA_RCVBUF)
+            LOGGER.debug("Data server receive buffer: %s bytes",
+                         data_socket.getsockopt(socket.SOL_SOCKET,
+                                                socket.SO_RCVBUF))
             data_server_thread = threading.Thread(
                 target=self.data_server.serve_forever)
             data_server_thread.daemon = True
             data_server_thread.start()
-            logging.debug(
+            LOGGER.debug(
                 "Started data server on UDP port %s", self.data_port)
 
         self.control_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -329,63 +395,131 @@ class KNXIPTunnel():
 
         # Connect packet
         frame = KNXIPFrame(KNXIPFrame.CONNECT_REQUEST)
-
-        # Control endpoint
-        body = []
-        body.extend([0x08, 0x01])  # length 8 bytes, UPD
-        dummy_ip, port = self.control_socket.getsockname()
-        body.extend(ip_to_array(local_ip))
-        body.extend(int_to_array(port, 2))
-
-        # Data endpoint
-        body.extend([0x08, 0x01])  # length 8 bytes, UPD
-        body.extend(ip_to_array(local_ip))
-        body.extend(int_to_array(self.data_port, 2))
-
-        #
-        body.extend([0x04, 0x04, 0x02, 0x00])
-        frame.body = body
+        frame.body = self._connect_request_body(local_ip)
 
         try:
-            self.control_socket.sendto(bytes(frame.to_frame()),
-                                       (self.remote_ip, self.remote_port))
-            received = self.control_socket.recv(1024)
+            # All control traffic goes to the gateway, connecting the socket
+            # saves the address lookup on every send
+            self.control_socket.connect((self.remote_ip, self.remote_port))
+            self.control_socket.send(frame.to_frame())
+            nbytes = self.control_socket.recv_into(self._control_buf)
         except socket.error:
             self.control_socket.close()
             self.control_socket = None
-            logging.error("KNX/IP gateway did not respond to connect request")
+            # The route might have changed, look it up again next time
+            self._local_route = None
+            LOGGER.error("KNX/IP gateway did not respond to connect request")
             return False
 
-        # Check if the response is an TUNNELING ACK
-        r_sid = received[2] * 256 + received[3]
-
-        if r_sid == KNXIPFrame.CONNECT_RESPONSE:
-            self.channel = received[6]
-            status = received[7]
-            if status == 0:
-                hpai = received[8:10]
-                logging.debug("Connected KNX IP tunnel " +
-                              "(Channel: {}, HPAI: {} {})".format(
-                                  self.channel, hpai[0], hpai[1]))
-            else:
-                logging.error("KNX IP tunnel connect error:" +
-                              "(Channel: {}, Status: {})".format(
-                                  self.channel, status))
-                return False
+        response = self._parse_connect_response(
+            memoryview(self._control_buf)[:nbytes])
+        if response is None:
+            self.control_socket.close()
+            self.control_socket = None
+            return False
 
-        else:
-            logging.error(
-                "Could not initiate tunnel connection, STI = {0:%s}", r_sid)
+        self.channel, status = response
+        if status != 0:
+            LOGGER.error("KNX IP tunnel connect error:"
+                         "(Channel: %s, Status: %s)",
+                         self.channel, status)
+            self.control_socket.close()
+            self.control_socket = None
             return False
 
         self.connected = True
+        self._start_keepalive()
 
         return True
 
+    def _start_keepalive(self):
+        """Start the heartbeat thread of a new connection."""
+        # Every connection gets its own event, a heartbeat thread that is
+        # still finishing after a disconnect never keeps running
+        self._keepalive_stop = threading.Event()
+        self.keepalive_thread = threading.Thread(
+            target=self.keepalive, args=(self._keepalive_stop,))
+        self.keepalive_thread.daemon = True
+        self.keepalive_thread.start()
+
+    def _connect_request_body(self, local_ip):
+        """Create the body of a connect request.
+
+        This also packs the control endpoint HPAI used by disconnect and
+        heartbeat requests.
+        """
+        # Both endpoints share the local address, parse it only once
+        local_ip_bytes = socket.inet_aton(local_ip)
+        body = bytearray(20)
+
+        # Control endpoint
+        dummy_ip, port = self.control_socket.getsockname()
+        self._control_hpai = _HPAI_STRUCT.pack(
+            0x08, KNXIPFrame.IPV4_UDP, local_ip_bytes, port)
+        body[0:8] = self._control_hpai
+
+        # Data endpoint
+        _HPAI_STRUCT.pack_into(body, 8, 0x08, KNXIPFrame.IPV4_UDP,
+                               local_ip_bytes, self.data_port)
+
+        # Connection request information
+        body[16:20] = _CRI_TUNNEL
+        return body
+
+    @staticmethod
+    def _parse_connect_response(received):
+        """Return channel and status of a connect response.
+
+        Returns None if the datagram is not a CONNECT_RESPONSE.
+        """
+        if len(received) < _RESPONSE_STRUCT.size:
+            LOGGER.error("Could not initiate tunnel connection, "
+                         "response too short (%d bytes)", len(received))
+            return None
+
+        # Header, channel and status are decoded together
+        dummy_length, dummy_version, r_sid, dummy_total, channel, status = \
+            _RESPONSE_STRUCT.unpack_from(received)
+        if r_sid != KNXIPFrame.CONNECT_RESPONSE:
+            LOGGER.error(
+                "Could not initiate tunnel connection, STI = %x", r_sid)
+            return None
+
+        # Data endpoint HPAI of the gateway, parsed in place. It is only
+        # logged, so a truncated one is not an error
+        if status == 0 and \
+                len(received) >= _RESPONSE_STRUCT.size + _HPAI_STRUCT.size:
+            dummy_size, dummy_proto, ipaddr, port = \
+                _HPAI_STRUCT.unpack_from(received, 8)
+            LOGGER.debug("Connected KNX IP tunnel "
+                         "(Channel: %s, HPAI: %s:%s)",
+                         channel, socket.inet_ntoa(ipaddr), port)
+
+        return channel, status
+
+    def _local_ip(self):
+        """Return the local IP address used to reach the KNX/IP gateway.
+
+        The lookup is cached until the gateway address changes or a connect
+        request fails.
+        """
+        remote = (self.remote_ip, self.remote_port)
+        if self._local_route is None or self._local_route[0] != remote:
+            # Connecting a datagram socket sends nothing, but selects the
+            # local address
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                sock.connect(remote)
+                self._local_route = (remote, sock.getsockname()[0])
+            finally:
+                sock.close()
+
+        return self._local_route[1]
+
     def disconnect(self):
         """Disconnect an open tunnel connection"""
         if self.connected and self.channel:
-            logging.debug("Disconnecting KNX/IP tunnel...")
+            LOGGER.debug("Disconnecting KNX/IP tunnel...")
 
             frame = KNXIPFrame(KNXIPFrame.DISCONNECT_REQUEST)
             frame.body = self.hpai_body()
@@ -397,17 +531,21 @@ class KNXIPTunnel():
             else:
                 self.seq = 0
 
-            self.control_socket.sendto(
-                bytes(frame.to_frame()), (self.remote_ip, self.remote_port))
+            self.control_socket.send(frame.to_frame())
             # TODO: Impelement the Disconnect_Response Handling from Gateway
             # Control Channel > Client Control Channel
 
         else:
-            logging.debug("Disconnect - no connection, nothing to do")
+            LOGGER.debug("Disconnect - no connection, nothing to do")
 
         self.channel = None
+        self._hpai_bytes = None
         self.connected = False
 
+        if self._keepalive_stop is not None:
+            self._keepalive_stop.set()
+            self._keepalive_stop = None
+
     def check_connection_state(self):
         """Check the state of the connection using connection state request.
 
@@ -428,7 +566,7 @@ class KNXIPTunnel():
 
         maximum_retry = 3
         for retry_counter in range(0, maximum_retry):
-            logging.debug("Heartbeat: Send connection state request")
+            LOGGER.debug("Heartbeat: Send connection state request")
 
             # Suggestion:
             # Carve the Control Socket out of the KNXIPTunnel
@@ -436,46 +574,41 @@ class KNXIPTunnel():
             # function and Implement in there the Heartbeat so we
             # can block when other Functions want to send
             self.control_socket.settimeout(10)  # Kind of a quirks
-            self.control_socket.sendto(bytes(frame.to_frame()),
-                                       (self.remote_ip, self.remote_port))
+            self.control_socket.send(frame.to_frame())
 
             try:
-                self.control_socket.sendto(bytes(frame.to_frame()),
-                                           (self.remote_ip, self.remote_port))
-                receive = self.control_socket.recv(1024)
-
-            except socket.timeout:
-                logging.info("Heartbeat: No response, Retry Counter %d/%d",
-                             retry_counter, maximum_retry)
+                self.control_socket.send(frame.to_frame())
+                nbytes = self.control_socket.recv_into(self._control_buf)
+                receive = memoryview(self._control_buf)[:nbytes]
+
+            except socket.error:
+                # Timeout, or an ICMP error reported on the connected socket
+                LOGGER.info("Heartbeat: No response, Retry Counter %d/%d",
+                            retry_counter, maximum_retry)
                 break
 
-            frame = KNXIPFrame.from_frame(receive)
-            if frame.service_type_id == KNXIPFrame.CONNECTIONSTATE_RESPONSE:
-                if frame.body[1] == KNXIPFrame.E_NO_ERROR:
-                    logging.debug("Heartbeat: Successful")
+            if nbytes < _RESPONSE_STRUCT.size:
+                LOGGER.error("Heartbeat: Invalid Response!")
+                continue
+
+            # Header, channel and status are decoded together
+            dummy_length, dummy_version, r_sid, dummy_total, dummy_channel, \
+                status = _RESPONSE_STRUCT.unpack_from(receive)
+            if r_sid == KNXIPFrame.CONNECTIONSTATE_RESPONSE:
+                if status == KNXIPFrame.E_NO_ERROR:
+                    LOGGER.debug("Heartbeat: Successful")
                     res = True
                     break
-                if frame.body[1] == KNXIPFrame.E_CONNECTION_ID:
-                    logging.error(
-                        "Heartbeat: Response No active "
-                        "connection found for Channel:%d ", self.channel
-                    )
-                if frame.body[1] == KNXIPFrame.E_DATA_CONNECTION:
-                    logging.error(
-                        "Heartbeat: Response Data Connection Error Response "
-                        "for  Channel:%d ", self.channel
-                    )
-                if frame.body[1] == KNXIPFrame.E_DATA_CONNECTION:
-                    logging.error(
-                        "Heartbeat: Response KNX Sub Network Error Response "
-                        "for  Channel:%d ", self.channel
-                    )
+                problem = KNXIPFrame.CONNECTIONSTATE_ERRORS.get(status)
+                if problem:
+                    LOGGER.error("Heartbeat: Response %s for Channel:%d ",
+                                 problem, self.channel)
             else:
-                logging.error("Heartbeat: Invalid Response!")
+                LOGGER.error("Heartbeat: Invalid Response!")
 
         if self.connection_state != 0:
-            logging.info("Heartbeat: Connection state was %s",
-                         self.connection_state)
+            LOGGER.info("Heartbeat: Connection state was %s",
+                        self.connection_state)
             res = False
 
         if not res:
@@ -491,19 +624,15 @@ class KNXIPTunnel():
 
         This is used for disconnect and connection state requests.
         """
-        body = []
-        # ============ IP Body ==========
-        body.extend([self.channel])  # Communication Channel Id
-        body.extend([0x00])  # Reserverd
-        # =========== Client HPAI ===========
-        body.extend([0x08])  # HPAI Length
-        body.extend([0x01])  # Host Protocol
-        # Tunnel Client Socket IP
-        body.extend(ip_to_array(self.control_socket.getsockname()[0]))
-        # Tunnel Client Socket Port
-        body.extend(int_to_array(self.control_socket.getsockname()[1]))
+        if self._hpai_bytes is None:
+            # ============ IP Body ==========
+            # Communication Channel Id, reserved
+            # =========== Client HPAI ===========
+            # Tunnel client socket IP and port, packed once on connect
+            self._hpai_bytes = bytes((self.channel, 0x00)) + \
+                self._control_hpai
 
-        return body
+        return self._hpai_bytes
 
     def send_tunnelling_request(self, cemi, auto_connect=True):
         """Sends a tunneling request based on the given CEMI data.
@@ -517,28 +646,34 @@ class KNXIPTunnel():
             else:
                 raise KNXException("KNX tunnel not connected")
 
-        frame = KNXIPFrame(KNXIPFrame.TUNNELING_REQUEST)
-        # Connection header see KNXnet/IP 4.4.6 TUNNELLING_REQUEST
-        body = [0x04, self.channel, self.seq, 0x00]
-        if self.seq < 0xff:
-            self.seq += 1
-        else:
-            self.seq = 0
-        body.extend(cemi.to_body())
-        frame.body = body
-        self.data_server.socket.sendto(
-            frame.to_frame(), (self.remote_ip, self.remote_port))
-
-        # See KNX specification 3.8.4 chapter 2.6 "Frame confirmation"
-        # Send KNX packet 2 times if not acknowledged and close
-        # the connection if no ack is received
-        res = self.ack_semaphore.acquire(blocking=True, timeout=1)
-        # Resend package if not acknowledged after 1 seconds
-        if not res:
+        cemi_body = cemi.to_body()
+        length = _TUNNELING_HEADER_STRUCT.size + len(cemi_body)
+        with self._lock:
+            if length > len(self._tx_buf):
+                self._tx_buf = bytearray(length)
+            # Connection header see KNXnet/IP 4.4.6 TUNNELLING_REQUEST
+            _TUNNELING_HEADER_STRUCT.pack_into(
+                self._tx_buf, 0, 0x06, 0x10, KNXIPFrame.TUNNELING_REQUEST,
+                length, 0x04, self.channel, self.seq, 0x00)
+            self._tx_buf[_TUNNELING_HEADER_STRUCT.size:length] = cemi_body
+            frame = memoryview(self._tx_buf)[:length]
+            if self.seq < 0xff:
+                self.seq += 1
+            else:
+                self.seq = 0
             self.data_server.socket.sendto(
-                frame.to_frame(), (self.remote_ip, self.remote_port))
+                frame, (self.remote_ip, self.remote_port))
 
+            # See KNX specification 3.8.4 chapter 2.6 "Frame confirmation"
+            # Send KNX packet 2 times if not acknowledged and close
+            # the connection if no ack is received
             res = self.ack_semaphore.acquire(blocking=True, timeout=1)
+            # Resend package if not acknowledged after 1 seconds
+            if not res:
+                self.data_server.socket.sendto(
+                    frame, (self.remote_ip, self.remote_port))
+
+                res = self.ack_semaphore.acquire(blocking=True, timeout=1)
 
         # disconnect and reconnect of not acknowledged
         if not res:
@@ -552,7 +687,7 @@ class KNXIPTunnel():
         if use_cache:
             res = self.value_cache.get(addr)
             if res:
-                logging.debug(
+                LOGGER.debug(
                     "Got value of group address %s from cache: %s", addr, res)
                 return res
 
@@ -560,17 +695,15 @@ class KNXIPTunnel():
         cemi.init_group_read(addr)
 
         with self._lock:
-            # There might be old messages in the result quue, remove them
-            self.result_queue.queue.clear()
+            # Forget responses that arrived before this request
+            self._response_event.clear()
+            self._response_addr = addr
             self.send_tunnelling_request(cemi)
             # Wait for the result
-            try:
-                res = self.result_queue.get(block=True, timeout=timeout)
-            except queue.Empty:
+            if not self._response_event.wait(timeout):
                 return None
 
-            self.result_queue.task_done()
-            return res
+            return self._response_data
 
     def group_write(self, addr, data, dptsize=0):
         """Send a group write to the given address.
@@ -596,7 +729,7 @@ class KNXIPTunnel():
         if len(data) != 1:
             problem = "Can't toggle a {}-octet group address {}".format(
                 len(data), addr)
-            logging.error(problem)
+            LOGGER.error(problem)
             raise KNXException(problem)
 
         if data[0] == 0:
@@ -606,7 +739,7 @@ class KNXIPTunnel():
         else:
             problem = "Can't toggle group address {} as value is {}".format(
                 addr, data[0])
-            logging.error(problem)
+            LOGGER.error(problem)
             raise KNXException(problem)
 
     def register_listener(self, address, func):
@@ -616,15 +749,7 @@ class KNXIPTunnel():
         will be called func(address, data).
         There can be multiple listeners for a given address
         """
-        try:
-            listeners = self.address_listeners[address]
-        except KeyError:
-            listeners = []
-            self.address_listeners[address] = listeners
-
-        if not func in listeners:
-            listeners.append(func)
-
+        self.address_listeners[address].add(func)
         return True
 
     def unregister_listener(self, address, func):
@@ -633,28 +758,27 @@ class KNXIPTunnel():
         Remove the listener for the given address. Returns true if the listener
         was found and removed, false otherwise
         """
-        listeners = self.address_listeners[address]
-        if listeners is None:
-            return False
-
-        if func in listeners:
+        listeners = self.address_listeners.get(address)
+        if listeners and func in listeners:
             listeners.remove(func)
             return True
 
         return False
 
+    def received_response(self, address, data):
+        """Complete a pending group read with a response from the KNX bus."""
+        if address == self._response_addr:
+            self._response_data = data
+            self._response_event.set()
+
     def received_message(self, address, data):
         """Process a message received from the KNX bus."""
         self.value_cache.set(address, data)
         if self.notify:
             self.notify(address, data)
 
-        try:
-            listeners = self.address_listeners[address]
-        except KeyError:
-            listeners = []
-
-        for listener in listeners:
+        # Iterate over a copy, listeners might (un)register concurrently
+        for listener in tuple(self.address_listeners.get(address, ())):
             listener(address, data)
 
 
@@ -666,57 +790,74 @@ class DataRequestHandler(SocketServer.BaseRequestHandler):
         data = self.request[0]
         sock = self.request[1]
 
-        frame = KNXIPFrame.from_frame(data)
+        # Only the header is needed to dispatch the frame
+        dummy_hlen, dummy_version, service_type_id, dummy_total_length = \
+            _HEADER_STRUCT.unpack_from(data)
 
-        if frame.service_type_id == KNXIPFrame.TUNNELING_REQUEST:
-            req = KNXTunnelingRequest.from_body(frame.body)
-            msg = CEMIMessage.from_body(req.cemi)
-            send_ack = False
-
-            tunnel = self.server.tunnel
-
-            if msg.code == 0x29:
-                # LData.req
-                send_ack = True
-            elif msg.code == 0x2e:
-                # LData.con
-                send_ack = True
-            else:
-                problem = "Unimplemented cEMI message code {}".format(msg.code)
-                logging.error(problem)
-                raise KNXException(problem)
-
-            # Cache data
-            if (msg.cmd == CEMIMessage.CMD_GROUP_WRITE) or (
-                    msg.cmd == CEMIMessage.CMD_GROUP_RESPONSE):
-                    # saw a value for a group address on the bus
-                tunnel.received_message(msg.dst_addr, msg.data)
-
-            # Put RESPONSES into the result queue
-            if msg.cmd == CEMIMessage.CMD_GROUP_RESPONSE:
-                tunnel.result_queue.put(msg.data)
-
-            if send_ack:
-                bodyack = [0x04, req.channel, req.seq, E_NO_ERROR]
-                ack = KNXIPFrame(KNXIPFrame.TUNNELLING_ACK)
-                ack.body = bodyack
-                sock.sendto(ack.to_frame(), self.client_address)
-
-        elif frame.service_type_id == KNXIPFrame.TUNNELLING_ACK:
-            logging.debug("Received tunneling ACK")
-            self.server.tunnel.ack_semaphore.release()
-        elif frame.service_type_id == KNXIPFrame.DISCONNECT_RESPONSE:
-            logging.debug("Disconnected")
-            self.channel = None
-            tunnel = self.server.tunnel
-            tunnel.data_server.shutdown()
-            tunnel.data_server = None
-        elif frame.service_type_id == KNXIPFrame.CONNECTIONSTATE_RESPONSE:
-            logging.debug("Connection state response")
-            tunnel.connection_state = frame.body[2]
+        handler = self._DISPATCH.get(service_type_id)
+        if handler:
+            handler(self, data, sock)
         else:
-            logging.info(
-                "Message type %s not yet implemented", frame.service_type_id)
+            LOGGER.info(
+                "Message type %s not yet implemented", service_type_id)
+
+    def _handle_tunneling_request(self, data, sock):
+        """Cache and acknowledge a received cEMI message."""
+        # Slicing a view does not copy, the tunnelling request and the
+        # cEMI data are parsed in place
+        req = KNXTunnelingRequest.from_body(memoryview(data)[6:])
+        msg = CEMIMessage.from_body(req.cemi)
+        tunnel = self.server.tunnel
+
+        if msg.code not in CEMIMessage.MESSAGE_CODES:
+            problem = "Unimplemented cEMI message code {}".format(msg.code)
+            LOGGER.error(problem)
+            raise KNXException(problem)
+
+        # Cache data
+        if (msg.cmd == CEMIMessage.CMD_GROUP_WRITE) or (
+                msg.cmd == CEMIMessage.CMD_GROUP_RESPONSE):
+                # saw a value for a group address on the bus
+            tunnel.received_message(msg.dst_addr, msg.data)
+
+        # Hand RESPONSES to a waiting group read
+        if msg.cmd == CEMIMessage.CMD_GROUP_RESPONSE:
+            tunnel.received_response(msg.dst_addr, msg.data)
+
+        # The ACK is a KNX/IP header and a connection header only
+        sock.sendto(_TUNNELING_HEADER_STRUCT.pack(
+            0x06, 0x10, KNXIPFrame.TUNNELLING_ACK,
+            _TUNNELING_HEADER_STRUCT.size, 0x04, req.channel, req.seq,
+            E_NO_ERROR), self.client_address)
+
+    def _handle_tunnelling_ack(self, _data, _sock):
+        """Wake up the sender waiting for this ACK."""
+        LOGGER.debug("Received tunneling ACK")
+        self.server.tunnel.ack_semaphore.release()
+
+    def _handle_disconnect_response(self, _data, _sock):
+        """Stop the data server of a disconnected tunnel."""
+        LOGGER.debug("Disconnected")
+        tunnel = self.server.tunnel
+        tunnel.data_server.shutdown()
+        tunnel.data_server = None
+
+    def _handle_connectionstate_response(self, data, _sock):
+        """Store the status of a connection state response."""
+        LOGGER.debug("Connection state response")
+        # Header, channel and status
+        if len(data) < _RESPONSE_STRUCT.size:
+            LOGGER.error("Ignoring truncated connection state response")
+            return
+        self.server.tunnel.connection_state = data[7]
+
+    # Handlers by KNX/IP service type
+    _DISPATCH = {
+        KNXIPFrame.TUNNELING_REQUEST: _handle_tunneling_request,
+        KNXIPFrame.TUNNELLING_ACK: _handle_tunnelling_ack,
+        KNXIPFrame.DISCONNECT_RESPONSE: _handle_disconnect_response,
+        KNXIPFrame.CONNECTIONSTATE_RESPONSE: _handle_connectionstate_response,
+    }
 
 
 class DataServer(SocketServer.ThreadingMixIn, SocketServer.UDPServer):
@@ -27,6 +27,12 @@ class KNXConversionTest(unittest.TestCase):
         self.assertEquals(float_to_knx2(0.01), [0x00, 0x01])
         self.assertEquals(float_to_knx2(1), [0x00, 0x64])
 
+        # values at the mantissa limits switch to the next exponent
+        self.assertEquals(float_to_knx2(20.48), [0x0c, 0x00])
+        self.assertEquals(float_to_knx2(-20.48), [0x80, 0x00])
+        self.assertEquals(float_to_knx2(-20.49), [0x8b, 0xff])
+        self.assertEquals(float_to_knx2(-40.96), [0x88, 0x00])
+
     def test_knx_to_float(self):
         """Does the KNX to float conversion works correctly?"""
 
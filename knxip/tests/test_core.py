@@ -1,5 +1,5 @@
 import unittest
-from knxip.core import parse_group_address
+from knxip.core import parse_group_address, KNXException, KNXMessage
 
 
 class KNXIPCoreTestCase(unittest.TestCase):
@@ -15,5 +15,42 @@ class KNXIPCoreTestCase(unittest.TestCase):
         self.assertEquals(parse_group_address("1/1/1"), 2305)
         self.assertEquals(parse_group_address("4/8/45"), 10285)
 
+    def test_invalid_group_address(self):
+        """Are malformed group addresses rejected?"""
+        for addr in ["", "/1", "1/", "1/2/3/4", "a/1/1", "+1", " 1", "1_0",
+                     "\u0661/\u0662/\u0663", "1/\u0662", "\u0661"]:
+            self.assertRaises(KNXException, parse_group_address, addr)
+        self.assertRaises(KNXException, parse_group_address, None)
+
+    def test_message_frame(self):
+        """Do KNX messages survive a conversion to a frame and back?"""
+        for length in [1, 15]:
+            msg = KNXMessage()
+            msg.src_addr = 0x1101
+            msg.dst_addr = 0x0a01
+            msg.length = length
+            msg.data = list(range(1, length))
+            frame = msg.to_frame()
+            self.assertEqual(len(frame), 6 + length)
+            self.assertEqual(frame[-1], sum(frame[:-1]) & 0xff)
+
+            res = KNXMessage.from_frame(frame)
+            self.assertEqual(res.src_addr, 0x1101)
+            self.assertEqual(res.dst_addr, 0x0a01)
+            self.assertEqual(res.length, length)
+            self.assertEqual(list(res.data), msg.data)
+
+    def test_message_frame_empty(self):
+        """Does a message with length 0 still get a checksum?"""
+        msg = KNXMessage()
+        msg.length = 16  # wraps to 0
+        msg.data = [1, 2, 3]
+        frame = msg.to_frame()
+        self.assertEqual(len(frame), 7)
+        self.assertEqual(frame[5] & 0x0f, 0)
+        self.assertEqual(frame[-1], sum(frame[:-1]) & 0xff)
+        # A length of 0 cannot be represented by the frame format
+        self.assertRaises(KNXException, KNXMessage.from_frame, frame)
+
 if __name__ == '__main__':
     unittest.main()
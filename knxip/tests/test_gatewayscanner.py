@@ -1,12 +1,18 @@
 import unittest
 import logging
+import os
+import socket
+import struct
 import sys
+import threading
 from knxip.gatewayscanner import GatewayScanner
 
 
 class test_GatewayScanner(unittest.TestCase):
     """Tests for `gatewayscanner.py`."""
 
+    @unittest.skipUnless(os.environ.get('KNX_LIVE'),
+                         'requires live KNX gateway')
     def test_tryScan(self):
         desired_port = 3671
         sc = GatewayScanner()
@@ -14,6 +20,43 @@ class test_GatewayScanner(unittest.TestCase):
         print("Received Gateay: {}:{}".format(result[0], result[1]))
         self.assertEqual(desired_port, result[1])
 
+    def _search(self, responses, timeout=1):
+        """Search a local fake gateway that sends the given responses."""
+        gateway = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(gateway.close)
+        gateway.bind(('127.0.0.1', 0))
+
+        def serve():
+            data, dummy_addr = gateway.recvfrom(1024)
+            # Answer to the discovery endpoint of the search request
+            ipaddr = socket.inet_ntoa(data[8:12])
+            port = struct.unpack_from('!H', data, 12)[0]
+            for response in responses:
+                gateway.sendto(response, (ipaddr, port))
+
+        thread = threading.Thread(target=serve)
+        thread.daemon = True
+        thread.start()
+
+        sc = GatewayScanner('127.0.0.1', gateway.getsockname()[1],
+                            '127.0.0.1', timeout)
+        return sc.start_search()
+
+    def test_search(self):
+        response = bytes([0x06, 0x10, 0x02, 0x02, 0x00, 0x0e,
+                          0x08, 0x01, 192, 168, 1, 10, 0x0e, 0x57])
+        self.assertEqual(("192.168.1.10", 3671), self._search([response]))
+
+    def test_search_truncated_response(self):
+        # Datagrams shorter than header and HPAI are ignored
+        truncated = bytes([0x06, 0x10, 0x02, 0x02, 0x00, 0x0e,
+                           0x08, 0x01, 192, 168, 1, 10, 0x0e])
+        self.assertIsNone(self._search([truncated], timeout=0.5))
+
+        response = bytes([0x06, 0x10, 0x02, 0x02, 0x00, 0x0e,
+                          0x08, 0x01, 192, 168, 1, 11, 0x0e, 0x57])
+        self.assertEqual(("192.168.1.11", 3671),
+                         self._search([truncated, response]))
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.DEBUG)
@@ -8,7 +8,7 @@ import time
 import os
 from datetime import datetime
 
-from knxip.ip import KNXIPTunnel
+from knxip.ip import KNXIPTunnel, CEMIMessage, DataRequestHandler
 
 # If a KNX gateway IP is set in the environment, use this
 gwip = os.environ.get('GWIP')
@@ -19,6 +19,8 @@ print("Using KNX Gateway IP ",gwip)
 
 class TestKNXIPTunnel(unittest.TestCase):
 
+    @unittest.skipUnless(os.environ.get('KNX_LIVE'),
+                         'requires live KNX gateway')
     def testConnect(self):
         """Test if the system can connect to an auto-discovered gateway"""
         # Try to connect to an auto-discovered KNX gateway
@@ -35,6 +37,8 @@ class TestKNXIPTunnel(unittest.TestCase):
         diff = tock - tick    # the result is a datetime.timedelta object
         self.assertTrue(diff.total_seconds() >= 1 and diff.total_seconds() < 3)
 
+    @unittest.skipUnless(os.environ.get('KNX_LIVE'),
+                         'requires live KNX gateway')
     def testAutoConnect(self):
         """Test if the KNX tunnel will be automatically connected."""
         tunnel = KNXIPTunnel(gwip)
@@ -43,6 +47,8 @@ class TestKNXIPTunnel(unittest.TestCase):
         self.assertTrue(tunnel.connected)
         
         
+    @unittest.skipUnless(os.environ.get('KNX_LIVE'),
+                         'requires live KNX gateway')
     def testKeepAlive(self):
         """Test if the background thread runs and updated the state"""
         tunnel = KNXIPTunnel(gwip)
@@ -53,6 +59,8 @@ class TestKNXIPTunnel(unittest.TestCase):
         time.sleep(66)
         self.assertEqual(tunnel.connection_state,0)        
 
+    @unittest.skipUnless(os.environ.get('KNX_LIVE'),
+                         'requires live KNX gateway')
     def testReadTimeout(self):
         """Test if read timeouts work and group_read operations
 
@@ -79,6 +87,8 @@ class TestKNXIPTunnel(unittest.TestCase):
 
         tunnel.disconnect()
 
+    @unittest.skipUnless(os.environ.get('KNX_LIVE'),
+                         'requires live KNX gateway')
     def testCleanup(self):
         """Test of disconnect works fine
 
@@ -100,6 +110,90 @@ class TestKNXIPTunnel(unittest.TestCase):
         tunnel.register_listener(0, message_received)
         res = tunnel.unregister_listener(0, message_received)
         assert(res)
+        res = tunnel.unregister_listener(0, message_received)
+        assert(not res)
+        res = tunnel.unregister_listener(1, message_received)
+        assert(not res)
+
+
+class TestCEMIMessage(unittest.TestCase):
+
+    def testToBody(self):
+        """Test the encoding of group reads and writes."""
+        cemi = CEMIMessage()
+        cemi.init_group_read(0x0a01)
+        self.assertEqual(bytes(cemi.to_body()),
+                         bytes.fromhex('1100bce000000a01010000'))
+
+        # Small values are packed into the APCI byte
+        cemi = CEMIMessage()
+        cemi.init_group_write(0x0a01, [1])
+        self.assertEqual(bytes(cemi.to_body()),
+                         bytes.fromhex('1100bce000000a01010081'))
+
+        # Larger values follow the APCI
+        cemi = CEMIMessage()
+        cemi.init_group_write(0x0a01, [0x80])
+        self.assertEqual(bytes(cemi.to_body()),
+                         bytes.fromhex('1100bce000000a0102008080'))
+
+        cemi = CEMIMessage()
+        cemi.init_group_write(0x0a01, [12, 34], 2)
+        self.assertEqual(bytes(cemi.to_body()),
+                         bytes.fromhex('1100bce000000a010300800c22'))
+
+    def testFromBody(self):
+        """Test the decoding of received L_Data.ind messages."""
+        # 1 byte APDU, value packed into the APCI byte
+        cemi = CEMIMessage.from_body(
+            bytes.fromhex('2900bce011010a01010081'))
+        self.assertEqual(cemi.code, 0x29)
+        self.assertEqual(cemi.src_addr, 0x1101)
+        self.assertEqual(cemi.dst_addr, 0x0a01)
+        self.assertEqual(cemi.mpdu_len, 1)
+        self.assertEqual(cemi.cmd, CEMIMessage.CMD_GROUP_WRITE)
+        self.assertEqual(list(cemi.data), [1])
+
+        cemi = CEMIMessage.from_body(
+            bytes.fromhex('2900bce011010a01010000'))
+        self.assertEqual(cemi.cmd, CEMIMessage.CMD_GROUP_READ)
+
+        # 2 byte APDU, value follows the APCI
+        cemi = CEMIMessage.from_body(
+            bytes.fromhex('2900bce011010a0102004033'))
+        self.assertEqual(cemi.mpdu_len, 2)
+        self.assertEqual(cemi.cmd, CEMIMessage.CMD_GROUP_RESPONSE)
+        self.assertEqual(list(cemi.data), [0x33])
+
+        # Additional information is skipped
+        cemi = CEMIMessage.from_body(
+            bytes.fromhex('2902aaaabce011010a0102008033'))
+        self.assertEqual(cemi.dst_addr, 0x0a01)
+        self.assertEqual(cemi.cmd, CEMIMessage.CMD_GROUP_WRITE)
+        self.assertEqual(list(cemi.data), [0x33])
+
+
+class TestDataRequestHandler(unittest.TestCase):
+
+    def testConnectionStateResponse(self):
+        """Test if the status of a connection state response is stored."""
+
+        class Stub():
+            pass
+
+        server = Stub()
+        server.tunnel = Stub()
+        server.tunnel.connection_state = -1
+
+        # Header, channel 0x2a, status E_CONNECTION_ID
+        DataRequestHandler((bytes.fromhex('0610020800082a21'), None),
+                           ('127.0.0.1', 3671), server)
+        self.assertEqual(server.tunnel.connection_state, 0x21)
+
+        # A truncated response is ignored
+        DataRequestHandler((bytes.fromhex('0610020800082a'), None),
+                           ('127.0.0.1', 3671), server)
+        self.assertEqual(server.tunnel.connection_state, 0x21)
 
 
 if __name__ == "__main__":
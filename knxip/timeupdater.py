@@ -4,12 +4,17 @@ This implements a method to send date and time update packets to the KNX bus
 """
 
 import threading
-from time import sleep
+from time import monotonic, sleep
 import datetime
 
 from knxip.core import parse_group_address
 from knxip.conversion import *
-from time import sleep
+
+try:
+    from pysolar.solar import get_altitude
+except ImportError:
+    # Only needed for day/night updates
+    get_altitude = None
 
 
 class KNXDateTimeUpdater():
@@ -73,7 +78,8 @@ class KNXDateTimeUpdater():
                                     datetime_to_knx(d))
 
         if self.daynightaddr:
-            from pysolar.solar import get_altitude
+            if get_altitude is None:
+                raise ImportError("pysolar is required for day/night updates")
             alt = get_altitude(self.lat, self.long, d)
             if alt > 0:
                 self.tunnel.group_write(self.daynightaddr, 1)
@@ -83,12 +89,17 @@ class KNXDateTimeUpdater():
     def updater_loop(self):
         """ Main loop that should run in the background. """
         self.updater_running = True
+        next_update = monotonic()
         while (self.updater_running):
             self.send_updates()
-            sleep(self.updateinterval)
+            # Sleep until the next deadline, so updates do not drift. Missed
+            # deadlines are skipped rather than caught up with a burst
+            now = monotonic()
+            next_update = max(next_update + self.updateinterval, now)
+            sleep(next_update - now)
 
     def run_updater_in_background(self):
         """ Starts a thread that runs the updater in the background. """
-        thread = threading.Thread(target=self.updater_loop())
+        thread = threading.Thread(target=self.updater_loop)
         thread.daemon = True
         thread.start()